@@ -1,8 +1,46 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, func, case
 from app import models, schemas
+from app.singleflight import SingleFlight
+from app.scheduler import calculate_fine
+from app.planner import plan_list_query
 from typing import List, Optional
+from datetime import date
 from fastapi import HTTPException
+import os
+
+# Shared by the hot book read paths so a burst of identical requests runs one query
+book_reads = SingleFlight()
+
+# Columns the list endpoints can sort by
+BOOK_SORT_FIELDS = ("book_id", "title", "published_year")
+LOAN_SORT_FIELDS = ("loan_id", "loan_date", "due_date")
+
+# Columns the list endpoints can filter or sort on, for index planning
+BOOK_LIST_FIELDS = BOOK_SORT_FIELDS + ("category_id",)
+LOAN_LIST_FIELDS = LOAN_SORT_FIELDS + ("member_id", "book_id", "return_date")
+
+# Approximate total counts stop counting after this many rows
+APPROXIMATE_COUNT_LIMIT = int(os.getenv("APPROXIMATE_COUNT_LIMIT", "10000"))
+
+def _check_sort(sort: Optional[str], allowed):
+    if sort is not None and sort not in allowed:
+        raise HTTPException(status_code=400, detail=f"Invalid sort field, expected one of: {', '.join(allowed)}")
+
+def _count(db: Session, query, approximate: bool):
+    """Return (count, exact) for query; approximate counts stop at APPROXIMATE_COUNT_LIMIT rows."""
+    if not approximate:
+        return query.order_by(None).count(), True
+    capped = query.order_by(None).limit(APPROXIMATE_COUNT_LIMIT + 1).subquery()
+    count = db.query(func.count()).select_from(capped).scalar()
+    return min(count, APPROXIMATE_COUNT_LIMIT), count <= APPROXIMATE_COUNT_LIMIT
+
+def _order_by(query, column, pk, order: str):
+    # The primary key breaks ties so pages never overlap or skip rows
+    columns = [column] if column is pk else [column, pk]
+    if order == "desc":
+        columns = [c.desc() for c in columns]
+    return query.order_by(*columns)
 
 # Member CRUD operations
 def create_member(db: Session, member: schemas.MemberCreate):
@@ -77,27 +115,188 @@ def create_book(db: Session, book: schemas.BookCreate):
     
     db_book = models.Book(**book.dict())
     db.add(db_book)
+    _bump_book_counts(db, db_book.category_id, books=1, available=int(db_book.copies_available > 0))
     db.commit()
     db.refresh(db_book)
     return db_book
 
+def _query_book(db: Session, book_id: int):
+    return db.query(models.Book).options(joinedload(models.Book.category)).filter(models.Book.book_id == book_id).first()
+
+def _query_shared_book(db: Session, book_id: int):
+    book = _query_book(db, book_id)
+    return _detach(db, [book])[0] if book else None
+
+def _filter_books(query, category_id: Optional[int], published_year_min: Optional[int],
+                  published_year_max: Optional[int], title_prefix: Optional[str], available_only: bool):
+    equal, ranges = [], []
+    
+    if category_id:
+        query = query.filter(models.Book.category_id == category_id)
+        equal.append("category_id")
+    
+    if published_year_min is not None:
+        query = query.filter(models.Book.published_year >= published_year_min)
+        ranges.append("published_year")
+    
+    if published_year_max is not None:
+        query = query.filter(models.Book.published_year <= published_year_max)
+        ranges.append("published_year")
+    
+    if title_prefix:
+        query = query.filter(models.Book.title.startswith(title_prefix, autoescape=True))
+        ranges.append("title")
+    
+    # Checked on the rows the chosen index returns
+    if available_only:
+        query = query.filter(models.Book.copies_available > 0)
+    
+    return query, equal, ranges
+
+def _query_books(db: Session, skip: int, limit: int, category_id: Optional[int],
+                 published_year_min: Optional[int], published_year_max: Optional[int],
+                 title_prefix: Optional[str], available_only: bool, sort: Optional[str], order: str):
+    _check_sort(sort, BOOK_SORT_FIELDS)
+    query, equal, ranges = _filter_books(
+        db.query(models.Book).options(joinedload(models.Book.category)),
+        category_id, published_year_min, published_year_max, title_prefix, available_only
+    )
+    sort_column = plan_list_query(models.Book.__table__, BOOK_LIST_FIELDS, equal=equal, ranges=ranges, sort=sort)
+    query = _order_by(query, getattr(models.Book, sort_column), models.Book.book_id, order)
+    return query.offset(skip).limit(limit).all()
+
+def _detach(db: Session, books):
+    # Coalesced results are shared as-is by every waiting request, so detach them
+    # (with their eagerly loaded category) from the session that loaded them
+    for book in books:
+        if book.category is not None and book.category in db:
+            db.expunge(book.category)
+        db.expunge(book)
+    return books
+
+def _get_book_for_write(db: Session, book_id: int):
+    # Write paths always read through their own session
+    book = _query_book(db, book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
+
 def get_book(db: Session, book_id: int):
-    book = db.query(models.Book).filter(models.Book.book_id == book_id).first()
+    book, _ = book_reads.do(("book", book_id), lambda: _query_shared_book(db, book_id))
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     return book
 
-def get_books(db: Session, skip: int = 0, limit: int = 100, category_id: Optional[int] = None):
-    query = db.query(models.Book)
-    if category_id:
-        query = query.filter(models.Book.category_id == category_id)
-    return query.offset(skip).limit(limit).all()
+def get_books(db: Session, skip: int = 0, limit: int = 100, category_id: Optional[int] = None,
+              published_year_min: Optional[int] = None, published_year_max: Optional[int] = None,
+              title_prefix: Optional[str] = None, available_only: bool = False,
+              sort: Optional[str] = None, order: str = "asc"):
+    params = (skip, limit, category_id, published_year_min, published_year_max, title_prefix, available_only, sort, order)
+    books, _ = book_reads.do(("books",) + params, lambda: _detach(db, _query_books(db, *params)))
+    return books
+
+def _count_books(db: Session, category_id: Optional[int], published_year_min: Optional[int],
+                 published_year_max: Optional[int], title_prefix: Optional[str], available_only: bool,
+                 approximate: bool):
+    if published_year_min is None and published_year_max is None and not title_prefix:
+        # Served from the maintained counters
+        query = db.query(func.coalesce(func.sum(
+            models.BookCount.available_count if available_only else models.BookCount.book_count
+        ), 0))
+        if category_id:
+            query = query.filter(models.BookCount.category_id == category_id)
+        return query.scalar(), True
+    
+    query, _, _ = _filter_books(
+        db.query(models.Book.book_id),
+        category_id, published_year_min, published_year_max, title_prefix, available_only
+    )
+    return _count(db, query, approximate)
+
+def count_books(db: Session, category_id: Optional[int] = None,
+                published_year_min: Optional[int] = None, published_year_max: Optional[int] = None,
+                title_prefix: Optional[str] = None, available_only: bool = False, approximate: bool = False):
+    """Return (count, exact) for the books matching the list filters."""
+    params = (category_id, published_year_min, published_year_max, title_prefix, available_only, approximate)
+    result, _ = book_reads.do(("count_books",) + params, lambda: _count_books(db, *params))
+    return result
+
+# Book counters: one BookCounts row per category (0 for uncategorized), created
+# with the category and built by init_book_counts from the app's startup hook,
+# then kept up to date in the same transaction as every change to Books or copies_available
+BOOK_COUNTS_JOB = "book_counts"
+
+def _bump_book_counts(db: Session, category_id: Optional[int], books: int = 0, available: int = 0):
+    if not books and not available:
+        return
+    # A single atomic UPDATE; the row always exists once the counters are built
+    updated = db.query(models.BookCount).filter(models.BookCount.category_id == (category_id or 0)).update({
+        models.BookCount.book_count: models.BookCount.book_count + books,
+        models.BookCount.available_count: models.BookCount.available_count + available,
+    }, synchronize_session=False)
+    if not updated:
+        # Fail the write rather than let the counters drift
+        raise HTTPException(
+            status_code=500,
+            detail=f"Book counters missing for category {category_id}; run crud.rebuild_book_counts"
+        )
+
+def rebuild_book_counts(db: Session):
+    """Recompute BookCounts from Books.
+
+    Run while the API is not serving writes, e.g. at startup or after bulk
+    changes made outside the API; concurrent book changes can be lost.
+    """
+    counts = {
+        key: (books, available or 0)
+        for key, books, available in db.query(
+            func.coalesce(models.Book.category_id, 0),
+            func.count(models.Book.book_id),
+            func.sum(case((models.Book.copies_available > 0, 1), else_=0))
+        ).group_by(models.Book.category_id)
+    }
+    keys = [0] + [category_id for (category_id,) in db.query(models.Category.category_id)]
+    
+    db.query(models.BookCount).delete(synchronize_session=False)
+    db.add_all([
+        models.BookCount(category_id=key, book_count=counts.get(key, (0, 0))[0], available_count=counts.get(key, (0, 0))[1])
+        for key in keys
+    ])
+    state = db.get(models.JobState, BOOK_COUNTS_JOB) or models.JobState(job_name=BOOK_COUNTS_JOB)
+    state.last_run_date = date.today()
+    db.add(state)
+    db.commit()
+
+def init_book_counts(db: Session):
+    """Build BookCounts once for a database that predates the counters."""
+    if not db.get(models.JobState, BOOK_COUNTS_JOB):
+        rebuild_book_counts(db)
+
+def get_book_facets(db: Session):
+    rows = db.query(models.BookCount, models.Category.category_name).outerjoin(
+        models.Category, models.Category.category_id == models.BookCount.category_id
+    ).filter(models.BookCount.book_count > 0).order_by(models.BookCount.category_id).all()
+    
+    categories = [
+        {
+            "category_id": counts.category_id or None,
+            "category_name": category_name,
+            "total": counts.book_count,
+            "available": counts.available_count,
+        }
+        for counts, category_name in rows
+    ]
+    return {
+        "total": sum(c["total"] for c in categories),
+        "available": sum(c["available"] for c in categories),
+        "categories": categories,
+    }
 
 def get_book_by_isbn(db: Session, isbn: str):
     return db.query(models.Book).filter(models.Book.isbn == isbn).first()
 
 def update_book(db: Session, book_id: int, book_update: schemas.BookUpdate):
-    db_book = get_book(db, book_id)
+    db_book = _get_book_for_write(db, book_id)
     
     # Check if ISBN is being updated and if it already exists
     if book_update.isbn and book_update.isbn != db_book.isbn:
@@ -111,17 +310,26 @@ def update_book(db: Session, book_id: int, book_update: schemas.BookUpdate):
         if not category:
             raise HTTPException(status_code=400, detail="Category not found")
     
+    old_category_id, was_available = db_book.category_id, int((db_book.copies_available or 0) > 0)
+    
     # Update only provided fields
     update_data = book_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_book, field, value)
     
+    is_available = int((db_book.copies_available or 0) > 0)
+    if db_book.category_id != old_category_id:
+        _bump_book_counts(db, old_category_id, books=-1, available=-was_available)
+        _bump_book_counts(db, db_book.category_id, books=1, available=is_available)
+    else:
+        _bump_book_counts(db, db_book.category_id, available=is_available - was_available)
+    
     db.commit()
     db.refresh(db_book)
     return db_book
 
 def delete_book(db: Session, book_id: int):
-    db_book = get_book(db, book_id)
+    db_book = _get_book_for_write(db, book_id)
     
     # Check if book has active loans
     active_loans = db.query(models.Loan).filter(
@@ -132,6 +340,7 @@ def delete_book(db: Session, book_id: int):
         raise HTTPException(status_code=400, detail="Cannot delete book with active loans")
     
     db.delete(db_book)
+    _bump_book_counts(db, db_book.category_id, books=-1, available=-int((db_book.copies_available or 0) > 0))
     db.commit()
     return {"message": "Book deleted successfully"}
 
@@ -144,6 +353,8 @@ def create_category(db: Session, category: schemas.CategoryCreate):
     
     db_category = models.Category(**category.dict())
     db.add(db_category)
+    db.flush()
+    db.add(models.BookCount(category_id=db_category.category_id, book_count=0, available_count=0))
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -162,8 +373,12 @@ def create_loan(db: Session, loan: schemas.LoanCreate):
     # Validate member exists
     member = get_member(db, loan.member_id)
     
+    # Loans already past due would sit behind the overdue scheduler's watermark
+    if loan.due_date < date.today():
+        raise HTTPException(status_code=400, detail="Due date cannot be in the past")
+    
     # Validate book exists and is available
-    book = get_book(db, loan.book_id)
+    book = _get_book_for_write(db, loan.book_id)
     if book.copies_available <= 0:
         raise HTTPException(status_code=400, detail="Book not available for loan")
     
@@ -183,22 +398,67 @@ def create_loan(db: Session, loan: schemas.LoanCreate):
     db_loan = models.Loan(**loan.dict())
     db.add(db_loan)
     book.copies_available -= 1
+    if book.copies_available == 0:
+        _bump_book_counts(db, book.category_id, available=-1)
     
     db.commit()
     db.refresh(db_loan)
     return db_loan
 
-def get_loans(db: Session, skip: int = 0, limit: int = 100, member_id: Optional[int] = None, active_only: bool = False):
-    query = db.query(models.Loan)
+def _filter_loans(query, member_id: Optional[int], active_only: bool, book_id: Optional[int],
+                  loan_date_from: Optional[date], loan_date_to: Optional[date], overdue: bool):
+    equal, ranges = [], []
     
     if member_id:
         query = query.filter(models.Loan.member_id == member_id)
+        equal.append("member_id")
+    
+    if book_id:
+        query = query.filter(models.Loan.book_id == book_id)
+        equal.append("book_id")
+    
+    if loan_date_from is not None:
+        query = query.filter(models.Loan.loan_date >= loan_date_from)
+        ranges.append("loan_date")
     
-    if active_only:
+    if loan_date_to is not None:
+        query = query.filter(models.Loan.loan_date <= loan_date_to)
+        ranges.append("loan_date")
+    
+    if overdue:
+        query = query.filter(models.Loan.due_date < date.today())
+        ranges.append("due_date")
+    
+    # Used as an index prefix where one fits, otherwise checked on the rows the chosen index returns
+    optional_equal = []
+    if active_only or overdue:
         query = query.filter(models.Loan.return_date.is_(None))
+        optional_equal.append("return_date")
     
+    return query, equal, ranges, optional_equal
+
+def get_loans(db: Session, skip: int = 0, limit: int = 100, member_id: Optional[int] = None, active_only: bool = False,
+              book_id: Optional[int] = None, loan_date_from: Optional[date] = None, loan_date_to: Optional[date] = None,
+              overdue: bool = False, sort: Optional[str] = None, order: str = "asc"):
+    _check_sort(sort, LOAN_SORT_FIELDS)
+    query, equal, ranges, optional_equal = _filter_loans(
+        db.query(models.Loan), member_id, active_only, book_id, loan_date_from, loan_date_to, overdue
+    )
+    sort_column = plan_list_query(
+        models.Loan.__table__, LOAN_LIST_FIELDS, equal=equal, ranges=ranges, sort=sort, optional_equal=optional_equal
+    )
+    query = _order_by(query, getattr(models.Loan, sort_column), models.Loan.loan_id, order)
     return query.offset(skip).limit(limit).all()
 
+def count_loans(db: Session, member_id: Optional[int] = None, active_only: bool = False,
+                book_id: Optional[int] = None, loan_date_from: Optional[date] = None,
+                loan_date_to: Optional[date] = None, overdue: bool = False, approximate: bool = False):
+    """Return (count, exact) for the loans matching the list filters."""
+    query, _, _, _ = _filter_loans(
+        db.query(models.Loan.loan_id), member_id, active_only, book_id, loan_date_from, loan_date_to, overdue
+    )
+    return _count(db, query, approximate)
+
 def return_book(db: Session, loan_id: int):
     loan = db.query(models.Loan).filter(models.Loan.loan_id == loan_id).first()
     if not loan:
@@ -208,12 +468,42 @@ def return_book(db: Session, loan_id: int):
         raise HTTPException(status_code=400, detail="Book already returned")
     
     # Set return date and increase available copies
-    from datetime import date
     loan.return_date = date.today()
     
-    book = get_book(db, loan.book_id)
+    book = _get_book_for_write(db, loan.book_id)
     book.copies_available += 1
+    if book.copies_available == 1:
+        _bump_book_counts(db, book.category_id, available=1)
+    
+    # Settle the fine for late returns
+    if loan.return_date > loan.due_date:
+        days_overdue, amount = calculate_fine(loan.due_date, loan.return_date)
+        fine = db.query(models.Fine).filter(models.Fine.loan_id == loan.loan_id).first()
+        if not fine:
+            fine = models.Fine(loan_id=loan.loan_id, member_id=loan.member_id)
+            db.add(fine)
+        fine.days_overdue = days_overdue
+        fine.amount = amount
+        fine.assessed_date = loan.return_date
     
     db.commit()
     db.refresh(loan)
-    return loan
\ No newline at end of file
+    return loan
+
+# Fine operations
+def get_fines(db: Session, skip: int = 0, limit: int = 100, member_id: Optional[int] = None, today: Optional[date] = None):
+    query = db.query(models.Fine).options(joinedload(models.Fine.loan))
+    
+    if member_id:
+        query = query.filter(models.Fine.member_id == member_id)
+    
+    fines = query.order_by(models.Fine.fine_id).offset(skip).limit(limit).all()
+    
+    # Fines of loans still out keep accruing; report today's amount without storing it
+    today = today or date.today()
+    for fine in fines:
+        if fine.loan.return_date is None:
+            db.expunge(fine)
+            fine.days_overdue, fine.amount = calculate_fine(fine.loan.due_date, today)
+            fine.assessed_date = today
+    return fines
\ No newline at end of file
@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import functions
 from dotenv import load_dotenv
 import os
 from urllib.parse import quote_plus
@@ -14,15 +18,57 @@ DB_PORT = os.getenv("DB_PORT", "3306")
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_NAME = os.getenv("DB_NAME", "LibraryDB")
+DB_ECHO = os.getenv("DB_ECHO", "True").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+# SQLite tuning, applied to every new connection
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-64000"),  # negative values are KiB
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
 
 # URL encode the password to handle special characters
 encoded_password = quote_plus(DB_PASSWORD) if DB_PASSWORD else ""
 
-# Create database URL with properly encoded password
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL overrides the MySQL settings above, e.g. sqlite:///./library.db
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# CURRENT_DATE is UTC on SQLite but local time on MySQL and in date.today(),
+# so the models' func.current_date() defaults use SQLite's local date instead
+@compiles(functions.current_date, "sqlite")
+def _sqlite_current_date(element, compiler, **kw):
+    return "date('now', 'localtime')"
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def create_db_engine(url, echo: bool = False, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    """Create an engine for url, tuned for its backend."""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(url, echo=echo, pool_size=pool_size, max_overflow=max_overflow)
+
+    # FastAPI runs sync endpoints on a thread pool, so connections move between threads
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT}
+    if url.database in (None, "", ":memory:"):
+        # Every connection to an in-memory database is a new database; share one
+        engine = create_engine(url, echo=echo, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        engine = create_engine(url, echo=echo, connect_args=connect_args, pool_size=pool_size, max_overflow=max_overflow)
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
 
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL, echo=True)
+engine = create_db_engine(DATABASE_URL, echo=DB_ECHO)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -36,4 +82,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
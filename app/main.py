@@ -1,11 +1,16 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uvicorn
+from datetime import date
+import math
 import os
 
 from app import crud, models, schemas
 from app.database import SessionLocal, engine, get_db
+from app.ratelimit import TokenBucketLimiter, client_key, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST
+from app.scheduler import OverdueScheduler
 
 # Create all tables (commented out for development without DB)
 # models.Base.metadata.create_all(bind=engine)
@@ -19,6 +24,54 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Rate limiting (set RATE_LIMIT_PER_SECOND=0 to disable)
+limiter = TokenBucketLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST) if RATE_LIMIT_PER_SECOND > 0 else None
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    if limiter is not None and request.url.path != "/health":
+        allowed, retry_after = limiter.acquire(client_key(request))
+        if not allowed:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+    return await call_next(request)
+
+# Overdue processing runs on its own thread, never on request-serving threads.
+# Enable it in exactly one process, or run `python -m app.scheduler` as a worker instead.
+scheduler = None
+
+@app.on_event("startup")
+def init_book_counts():
+    """Build the book counters once, before requests are served."""
+    db = SessionLocal()
+    try:
+        crud.init_book_counts(db)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️  Warning: Could not build book counters: {e}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_scheduler():
+    global scheduler
+    if os.getenv("OVERDUE_SCHEDULER_ENABLED", "False").lower() == "true":
+        scheduler = OverdueScheduler(SessionLocal)
+        scheduler.start()
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    if scheduler is not None:
+        scheduler.stop()
+
+def set_total_count(response: Response, count: int, exact: bool):
+    response.headers["X-Total-Count"] = str(count)
+    if not exact:
+        response.headers["X-Total-Count-Approximate"] = "true"
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 def read_root():
@@ -63,13 +116,40 @@ def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
 
 @app.get("/books/", response_model=List[schemas.Book], tags=["Books"])
 def read_books(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    published_year_min: Optional[int] = Query(None, description="Only books published in or after this year"),
+    published_year_max: Optional[int] = Query(None, description="Only books published in or before this year"),
+    title_prefix: Optional[str] = Query(None, description="Only books whose title starts with this text"),
+    available_only: bool = Query(False, description="Show only books with copies available"),
+    sort: Optional[str] = Query(None, description="Sort by book_id, title or published_year"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="Sort order"),
+    count: str = Query("exact", pattern="^(exact|approximate|none)$", description="How to compute the X-Total-Count header"),
     db: Session = Depends(get_db)
 ):
-    """Retrieve all books with optional category filtering and pagination."""
-    return crud.get_books(db, skip=skip, limit=limit, category_id=category_id)
+    """Retrieve books with filtering, sorting and pagination.
+    
+    Filter and sort combinations must be served by an index on Books; unsupported ones return 400.
+    """
+    books = crud.get_books(
+        db, skip=skip, limit=limit, category_id=category_id,
+        published_year_min=published_year_min, published_year_max=published_year_max,
+        title_prefix=title_prefix, available_only=available_only, sort=sort, order=order
+    )
+    if count != "none":
+        set_total_count(response, *crud.count_books(
+            db, category_id=category_id,
+            published_year_min=published_year_min, published_year_max=published_year_max,
+            title_prefix=title_prefix, available_only=available_only, approximate=count == "approximate"
+        ))
+    return books
+
+@app.get("/books/facets", response_model=schemas.BookFacets, tags=["Books"])
+def read_book_facets(db: Session = Depends(get_db)):
+    """Retrieve total, available and per-category book counts."""
+    return crud.get_book_facets(db)
 
 @app.get("/books/{book_id}", response_model=schemas.Book, tags=["Books"])
 def read_book(book_id: int, db: Session = Depends(get_db)):
@@ -110,20 +190,53 @@ def create_loan(loan: schemas.LoanCreate, db: Session = Depends(get_db)):
 
 @app.get("/loans/", response_model=List[schemas.Loan], tags=["Loans"])
 def read_loans(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
     member_id: Optional[int] = Query(None, description="Filter by member ID"),
     active_only: bool = Query(False, description="Show only active loans"),
+    book_id: Optional[int] = Query(None, description="Filter by book ID"),
+    loan_date_from: Optional[date] = Query(None, description="Only loans made on or after this date"),
+    loan_date_to: Optional[date] = Query(None, description="Only loans made on or before this date"),
+    overdue: bool = Query(False, description="Show only overdue loans"),
+    sort: Optional[str] = Query(None, description="Sort by loan_id, loan_date or due_date"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="Sort order"),
+    count: str = Query("approximate", pattern="^(exact|approximate|none)$", description="How to compute the X-Total-Count header"),
     db: Session = Depends(get_db)
 ):
-    """Retrieve loans with filtering options."""
-    return crud.get_loans(db, skip=skip, limit=limit, member_id=member_id, active_only=active_only)
+    """Retrieve loans with filtering, sorting and pagination.
+    
+    Filter and sort combinations must be served by an index on Loans; unsupported ones return 400.
+    """
+    loans = crud.get_loans(
+        db, skip=skip, limit=limit, member_id=member_id, active_only=active_only,
+        book_id=book_id, loan_date_from=loan_date_from, loan_date_to=loan_date_to,
+        overdue=overdue, sort=sort, order=order
+    )
+    if count != "none":
+        set_total_count(response, *crud.count_loans(
+            db, member_id=member_id, active_only=active_only, book_id=book_id,
+            loan_date_from=loan_date_from, loan_date_to=loan_date_to,
+            overdue=overdue, approximate=count == "approximate"
+        ))
+    return loans
 
 @app.put("/loans/{loan_id}/return", response_model=schemas.Loan, tags=["Loans"])
 def return_book(loan_id: int, db: Session = Depends(get_db)):
     """Return a borrowed book."""
     return crud.return_book(db, loan_id=loan_id)
 
+# Fine endpoints
+@app.get("/fines/", response_model=List[schemas.Fine], tags=["Fines"])
+def read_fines(
+    skip: int = 0,
+    limit: int = 100,
+    member_id: Optional[int] = Query(None, description="Filter by member ID"),
+    db: Session = Depends(get_db)
+):
+    """Retrieve fines for overdue loans."""
+    return crud.get_fines(db, skip=skip, limit=limit, member_id=member_id)
+
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 def health_check():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, SmallInteger
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, SmallInteger, Numeric, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -32,13 +32,29 @@ class Book(Base):
     title = Column(String(200), nullable=False)
     isbn = Column(String(20), unique=True, nullable=False, index=True)
     published_year = Column(SmallInteger)
-    category_id = Column(Integer, ForeignKey("Categories.category_id"))
+    category_id = Column(Integer, ForeignKey("Categories.category_id"), index=True)
     copies_available = Column(Integer, default=1)
     
     # Relationships
     category = relationship("Category", back_populates="books")
     book_authors = relationship("BookAuthor", back_populates="book")
     loans = relationship("Loan", back_populates="book")
+    
+    # Index-backed filters and sorts for the book list endpoint (see app/planner.py)
+    __table_args__ = (
+        Index("idx_books_title", "title"),
+        Index("idx_books_year", "published_year"),
+        Index("idx_books_category_title", "category_id", "title"),
+        Index("idx_books_category_year", "category_id", "published_year"),
+    )
+
+class BookCount(Base):
+    __tablename__ = "BookCounts"
+    
+    # Maintained by app/crud.py on every book and loan change; 0 = uncategorized
+    category_id = Column(Integer, primary_key=True, autoincrement=False)
+    book_count = Column(Integer, nullable=False, default=0)
+    available_count = Column(Integer, nullable=False, default=0)
 
 class Author(Base):
     __tablename__ = "Authors"
@@ -64,12 +80,46 @@ class Loan(Base):
     __tablename__ = "Loans"
     
     loan_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    member_id = Column(Integer, ForeignKey("Members.member_id"), nullable=False)
-    book_id = Column(Integer, ForeignKey("Books.book_id"), nullable=False)
+    member_id = Column(Integer, ForeignKey("Members.member_id"), nullable=False, index=True)
+    book_id = Column(Integer, ForeignKey("Books.book_id"), nullable=False, index=True)
     loan_date = Column(Date, nullable=False, default=func.current_date())
     due_date = Column(Date, nullable=False)
     return_date = Column(Date)
     
     # Relationships
     member = relationship("Member", back_populates="loans")
-    book = relationship("Book", back_populates="loans")
\ No newline at end of file
+    book = relationship("Book", back_populates="loans")
+    fine = relationship("Fine", back_populates="loan", uselist=False)
+    
+    # Supports the overdue scan (return_date IS NULL AND due_date < today) and
+    # the index-backed filters and sorts for the loan list endpoint
+    __table_args__ = (
+        Index("idx_loans_return_due", "return_date", "due_date"),
+        Index("idx_loans_loan_date", "loan_date"),
+        Index("idx_loans_member_date", "member_id", "loan_date"),
+        Index("idx_loans_member_due", "member_id", "due_date"),
+        Index("idx_loans_book_date", "book_id", "loan_date"),
+    )
+
+class Fine(Base):
+    __tablename__ = "Fines"
+    
+    fine_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    loan_id = Column(Integer, ForeignKey("Loans.loan_id", ondelete="CASCADE"), unique=True, nullable=False)
+    member_id = Column(Integer, ForeignKey("Members.member_id"), nullable=False, index=True)
+    days_overdue = Column(Integer, nullable=False)
+    amount = Column(Numeric(8, 2), nullable=False)
+    assessed_date = Column(Date, nullable=False)
+    reminder_sent_date = Column(Date)
+    
+    # Relationships
+    loan = relationship("Loan", back_populates="fine")
+
+class JobState(Base):
+    __tablename__ = "JobStates"
+    
+    job_name = Column(String(50), primary_key=True)
+    # Last (due_date, loan_id) processed, so each run only sees newly overdue loans
+    watermark_date = Column(Date)
+    watermark_loan_id = Column(Integer)
+    last_run_date = Column(Date)
\ No newline at end of file
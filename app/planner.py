@@ -0,0 +1,66 @@
+from fastapi import HTTPException
+from typing import Optional, Sequence
+
+# List endpoints only accept filter/sort combinations that an index declared on
+# the model can serve: equality filters on the leading index columns, then at
+# most one range filter and/or the sort on the next column. Secondary indexes
+# carry the primary key, which orders rows after the last index column.
+def index_columns(table, fields: Sequence[str]):
+    """Return every index of table usable by a list query, primary key first.
+
+    Each entry is (columns, carries_pk). Indexes are cut at the first column
+    clients cannot filter or sort on; a cut index no longer orders by the
+    primary key after its last usable column.
+    """
+    pk = tuple(column.name for column in table.primary_key.columns)
+    indexes = [(pk, True)]
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        columns = tuple(column.name for column in index.columns)
+        usable = []
+        for column in columns:
+            if column not in fields:
+                break
+            usable.append(column)
+        entry = (tuple(usable), len(usable) == len(columns))
+        if usable and entry not in indexes:
+            indexes.append(entry)
+    return pk, indexes
+
+def _match(indexes, pk, equal, ranges, sort):
+    for columns, carries_pk in indexes:
+        if carries_pk:
+            columns = columns + tuple(column for column in pk if column not in columns)
+        n = len(equal)
+        if n >= len(columns) or set(columns[:n]) != set(equal):
+            continue
+        lead = columns[n]
+        if any(column != lead for column in ranges):
+            continue
+        if sort is not None and sort != lead:
+            continue
+        return lead
+    return None
+
+def plan_list_query(table, fields: Sequence[str], equal: Sequence[str] = (), ranges: Sequence[str] = (),
+                    sort: Optional[str] = None, optional_equal: Sequence[str] = ()):
+    """Return the column to order by for this combination, or raise 400 if no index serves it.
+
+    fields are the columns the endpoint lets clients filter or sort on.
+    optional_equal are equality filters an index may use as a prefix, but that
+    can also be checked on the rows another index returns.
+    """
+    pk, indexes = index_columns(table, fields)
+    # Without a sort, keep ID order whenever some index can still serve it
+    sorts = [sort] if sort is not None else [pk[0], None]
+    for preferred in sorts:
+        for candidate in (list(equal) + list(optional_equal), list(equal)):
+            lead = _match(indexes, pk, candidate, ranges, preferred)
+            if lead is not None:
+                return lead
+
+    supported = ", ".join(f"({', '.join(columns)})" for columns, _ in indexes)
+    raise HTTPException(
+        status_code=400,
+        detail=f"Unsupported filter and sort combination. Filter by equality on leading columns, "
+               f"then range-filter or sort on the next column, of one of these indexes: {supported}"
+    )
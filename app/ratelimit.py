@@ -0,0 +1,46 @@
+from collections import OrderedDict
+import threading
+import time
+import os
+
+# Token bucket rate limiting per client, kept in process memory
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "40"))
+# Comma-separated API keys that get their own bucket; any other client is limited by IP
+RATE_LIMIT_API_KEYS = frozenset(key.strip() for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip())
+
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        # client key -> (tokens, last refill timestamp), least recently seen first
+        self._buckets = OrderedDict()
+
+    def acquire(self, key: str):
+        """Take one token for key. Returns (allowed, retry_after_seconds)."""
+        now = self._clock()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / self.rate
+
+            # Over the cap, forget the least recently seen client
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+def client_key(request, api_keys=RATE_LIMIT_API_KEYS) -> str:
+    # Unknown keys fall back to the IP bucket so rotating the header gains nothing
+    api_key = request.headers.get("x-api-key")
+    if api_key and api_key in api_keys:
+        return f"key:{api_key}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
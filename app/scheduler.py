@@ -0,0 +1,136 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, insert
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+import logging
+import threading
+import time
+import os
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Overdue processing configuration
+FINE_PER_DAY = Decimal(os.getenv("FINE_PER_DAY", "0.25"))
+FINE_MAX = Decimal(os.getenv("FINE_MAX", "20.00"))
+OVERDUE_BATCH_SIZE = int(os.getenv("OVERDUE_BATCH_SIZE", "1000"))
+OVERDUE_INTERVAL_SECONDS = int(os.getenv("OVERDUE_INTERVAL_SECONDS", "3600"))
+
+OVERDUE_JOB = "overdue_loans"
+
+def calculate_fine(due_date: date, as_of: date):
+    """Return (days_overdue, amount) for a loan due on due_date, assessed on as_of."""
+    days_overdue = max((as_of - due_date).days, 0)
+    return days_overdue, min(FINE_PER_DAY * days_overdue, FINE_MAX)
+
+def send_reminder(member_id: int, loan_id: int, due_date: date):
+    # Hook for e-mail/SMS delivery; for now reminders are written to the log
+    logger.info("Overdue reminder: member %s, loan %s, due %s", member_id, loan_id, due_date)
+
+def process_overdue_loans(db: Session, today: Optional[date] = None, batch_size: int = OVERDUE_BATCH_SIZE):
+    """Assess fines and send reminders for loans that became overdue since the last run.
+
+    Loans are walked in (due_date, loan_id) order in batches of batch_size using
+    idx_loans_return_due (return_date IS NULL is its equality prefix and the
+    primary key follows due_date), and the position of the last processed loan is stored
+    in JobStates after every batch so an interrupted run resumes where it left off.
+    The stored amount of a fine is the one assessed here; while the book is
+    still out crud.get_fines reports the amount accrued up to today, and
+    crud.return_book stores the final amount when the book comes back.
+    """
+    today = today or date.today()
+
+    state = db.get(models.JobState, OVERDUE_JOB)
+    if not state:
+        state = models.JobState(job_name=OVERDUE_JOB)
+        db.add(state)
+
+    processed = 0
+    while True:
+        query = db.query(models.Loan.loan_id, models.Loan.member_id, models.Loan.due_date).filter(
+            and_(models.Loan.return_date.is_(None), models.Loan.due_date < today)
+        )
+        if state.watermark_date is not None:
+            # The plain >= bound lets the index range start at the watermark
+            query = query.filter(
+                models.Loan.due_date >= state.watermark_date,
+                or_(models.Loan.due_date > state.watermark_date, models.Loan.loan_id > state.watermark_loan_id)
+            )
+        batch = query.order_by(models.Loan.due_date, models.Loan.loan_id).limit(batch_size).all()
+        if not batch:
+            break
+
+        # Skip loans a late return already fined
+        fined = {
+            loan_id for (loan_id,) in db.query(models.Fine.loan_id).filter(
+                models.Fine.loan_id.in_([row.loan_id for row in batch])
+            )
+        }
+        fines = []
+        for row in batch:
+            if row.loan_id in fined:
+                continue
+            days_overdue, amount = calculate_fine(row.due_date, today)
+            send_reminder(row.member_id, row.loan_id, row.due_date)
+            fines.append({
+                "loan_id": row.loan_id,
+                "member_id": row.member_id,
+                "days_overdue": days_overdue,
+                "amount": amount,
+                "assessed_date": today,
+                "reminder_sent_date": today,
+            })
+        if fines:
+            db.execute(insert(models.Fine), fines)
+
+        state.watermark_date = batch[-1].due_date
+        state.watermark_loan_id = batch[-1].loan_id
+        db.commit()
+        processed += len(fines)
+
+        if len(batch) < batch_size:
+            break
+
+    state.last_run_date = today
+    db.commit()
+    return processed
+
+class OverdueScheduler(threading.Thread):
+    """Runs process_overdue_loans periodically on a daemon thread with its own sessions."""
+
+    def __init__(self, session_factory, interval: int = OVERDUE_INTERVAL_SECONDS):
+        super().__init__(name="overdue-scheduler", daemon=True)
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            db = self.session_factory()
+            try:
+                processed = process_overdue_loans(db)
+                logger.info("Overdue run finished: %s new fines", processed)
+            except Exception:
+                db.rollback()
+                logger.exception("Overdue run failed")
+            finally:
+                db.close()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+if __name__ == "__main__":
+    # Run as a separate worker process: python -m app.scheduler
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    scheduler = OverdueScheduler(SessionLocal)
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
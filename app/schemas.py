@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
 from datetime import date
+from decimal import Decimal
 
 # Member Schemas
 class MemberBase(BaseModel):
@@ -63,6 +64,18 @@ class Book(BookBase):
     class Config:
         from_attributes = True
 
+# Facet Schemas
+class CategoryFacet(BaseModel):
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    total: int
+    available: int
+
+class BookFacets(BaseModel):
+    total: int
+    available: int
+    categories: List[CategoryFacet] = []
+
 # Author Schemas
 class AuthorBase(BaseModel):
     first_name: str
@@ -100,6 +113,19 @@ class Loan(LoanBase):
     class Config:
         from_attributes = True
 
+# Fine Schemas
+class Fine(BaseModel):
+    fine_id: int
+    loan_id: int
+    member_id: int
+    days_overdue: int
+    amount: Decimal
+    assessed_date: date
+    reminder_sent_date: Optional[date] = None
+    
+    class Config:
+        from_attributes = True
+
 # Response schemas
 class MemberWithLoans(Member):
     loans: List[Loan] = []
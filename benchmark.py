@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Library Management System API
+Runs against a throwaway SQLite database, no MySQL server required
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import create_db_engine
+from app.scheduler import process_overdue_loans
+
+def make_engine(path):
+    """Create a file-backed SQLite engine with the application's tuning"""
+    engine = create_db_engine(f"sqlite:///{path}", pool_size=32)
+    models.Base.metadata.create_all(bind=engine)
+    return engine
+
+class QueryCounter:
+    """Counts SELECT statements issued through an engine"""
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            with self._lock:
+                self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+def seed_books(Session, n_books=1000, n_categories=10):
+    db = Session()
+    db.add_all([models.Category(category_name=f"Category {i}") for i in range(n_categories)])
+    db.flush()
+    db.add_all([
+        models.Book(
+            title=f"Book {i}",
+            isbn=f"isbn-{i}",
+            published_year=1900 + i % 120,
+            category_id=1 + i % n_categories,
+            copies_available=i % 4
+        )
+        for i in range(n_books)
+    ])
+    db.commit()
+    db.close()
+
+def run_burst(Session, fn, clients):
+    """Fire `clients` identical calls at the same instant, one session per thread"""
+    barrier = threading.Barrier(clients)
+
+    def worker():
+        db = Session()
+        try:
+            barrier.wait()
+            fn(db)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+def bench_coalescing(Session, counter, clients=200):
+    """Compare DB load for a burst of identical book reads with and without coalescing"""
+    cases = [
+        ("GET /books/{id}", lambda db: crud._query_book(db, book_id=42), lambda db: crud.get_book(db, book_id=42)),
+        ("GET /books/?category_id=3",
+         lambda db: crud._query_books(
+             db, skip=0, limit=100, category_id=3, published_year_min=None, published_year_max=None,
+             title_prefix=None, available_only=False, sort=None, order="asc"
+         ),
+         lambda db: crud.get_books(db, skip=0, limit=100, category_id=3)),
+    ]
+    print(f"Burst of {clients} identical requests")
+    print(f"{'endpoint':<28}{'mode':<12}{'queries':>9}{'seconds':>10}")
+    for name, direct, coalesced in cases:
+        for mode, fn in (("direct", direct), ("coalesced", coalesced)):
+            counter.reset()
+            elapsed = run_burst(Session, fn, clients)
+            print(f"{name:<28}{mode:<12}{counter.count:>9}{elapsed:>10.3f}")
+
+class NoCoalescing:
+    """Stand-in for crud.book_reads that runs every call on its own"""
+    def do(self, key, fn):
+        return fn(), False
+
+def bench_endpoints(Session, counter, clients=50):
+    """Compare DB load for a burst of identical HTTP requests, including the X-Total-Count query"""
+    from fastapi.testclient import TestClient
+    from app import main
+    from app.database import get_db
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override_get_db
+    limiter, main.limiter = main.limiter, None
+    client = TestClient(main.app)
+    coalescing = crud.book_reads
+
+    db = Session()
+    crud.init_book_counts(db)
+    db.close()
+
+    print(f"Burst of {clients} identical HTTP requests")
+    print(f"{'endpoint':<40}{'mode':<12}{'queries':>9}{'seconds':>10}")
+    try:
+        for url in ("/books/42", "/books/?category_id=3", "/books/?published_year_min=1950"):
+            for mode, reads in (("direct", NoCoalescing()), ("coalesced", coalescing)):
+                crud.book_reads = reads
+                counter.reset()
+                elapsed = run_burst(Session, lambda db: client.get(url).raise_for_status(), clients)
+                print(f"{'GET ' + url:<40}{mode:<12}{counter.count:>9}{elapsed:>10.3f}")
+    finally:
+        crud.book_reads = coalescing
+        main.limiter = limiter
+        main.app.dependency_overrides.clear()
+
+def seed_loans(Session, n_loans, today, chunk=50000):
+    """Insert n_loans loans due over the 400 days around today, 6 in 7 already returned"""
+    db = Session()
+    db.add_all([
+        models.Member(first_name="Bench", last_name=str(i), email=f"bench{i}@example.com", join_date=today)
+        for i in range(100)
+    ])
+    db.commit()
+    for start in range(0, n_loans, chunk):
+        rows = []
+        for i in range(start, min(start + chunk, n_loans)):
+            due_date = today - timedelta(days=365 - i % 400)
+            rows.append({
+                "member_id": 1 + i % 100,
+                "book_id": 1 + i % 1000,
+                "loan_date": due_date - timedelta(days=14),
+                "due_date": due_date,
+                "return_date": due_date if i % 7 else None,
+            })
+        db.execute(insert(models.Loan), rows)
+        db.commit()
+    db.close()
+
+def bench_overdue(Session, n_loans):
+    """Time the overdue job over a large Loans table, then each incremental run on its own"""
+    today = date(2025, 1, 1)
+    start = time.perf_counter()
+    seed_loans(Session, n_loans, today)
+    print(f"Seeded {n_loans:,} loans in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'run':<24}{'new fines':>12}{'seconds':>10}")
+    runs = (
+        ("initial backlog", today),
+        ("next day", today + timedelta(days=1)),
+        ("same day again", today + timedelta(days=1)),
+    )
+    for name, run_date in runs:
+        db = Session()
+        start = time.perf_counter()
+        processed = process_overdue_loans(db, today=run_date)
+        elapsed = time.perf_counter() - start
+        db.close()
+        print(f"{name:<24}{processed:>12,}{elapsed:>10.3f}")
+
+def main():
+    print("Library Management System API - Benchmarks")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.db"))
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        counter = QueryCounter(engine)
+        seed_books(Session)
+
+        print()
+        bench_coalescing(Session, counter)
+
+        print()
+        bench_endpoints(Session, counter)
+
+        print()
+        bench_overdue(Session, int(os.getenv("BENCH_LOANS", "1000000")))
+
+        engine.dispose()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,7 @@ def create_tables():
         print("Creating database tables...")
         models.Base.metadata.create_all(bind=engine)
         print("✓ Database tables created successfully!")
+
         return True
     except Exception as e:
         print(f"⚠️  Warning: Could not create database tables: {e}")
@@ -51,6 +52,7 @@ if __name__ == "__main__":
         print("   DB_USER=your_username")
         print("   DB_PASSWORD=your_password")
         print("   DB_NAME=LibraryDB")
+        print("   Or use SQLite without a server: DATABASE_URL=sqlite:///./library.db")
         print("4. Restart the application")
         print("="*50)
         print("\nStarting API anyway (database endpoints will fail)...")
@@ -79,6 +79,231 @@ def test_schemas():
         print(f"✗ Schema validation error: {e}")
         return False
 
+def test_request_throttling():
+    """Test the token bucket limiter and single-flight coalescing"""
+    try:
+        import threading
+        import time
+        from types import SimpleNamespace
+        from app.ratelimit import TokenBucketLimiter, client_key
+        from app.singleflight import SingleFlight
+
+        now = [0.0]
+        limiter = TokenBucketLimiter(rate=1, burst=2, clock=lambda: now[0])
+        assert limiter.acquire("a")[0] and limiter.acquire("a")[0]
+        allowed, retry_after = limiter.acquire("a")
+        assert not allowed and retry_after == 1
+        assert limiter.acquire("b")[0]
+        now[0] = 1.0
+        assert limiter.acquire("a")[0]
+        print("✓ Token bucket limiter works")
+
+        def request(api_key):
+            return SimpleNamespace(headers={"x-api-key": api_key}, client=SimpleNamespace(host="10.0.0.1"))
+
+        rotating = TokenBucketLimiter(rate=1, burst=2, clock=lambda: 0.0)
+        allowed = [rotating.acquire(client_key(request(f"random-{i}"), api_keys={"known"}))[0] for i in range(5)]
+        assert allowed == [True, True, False, False, False]
+        assert client_key(request("known"), api_keys={"known"}) == "key:known"
+
+        lru = TokenBucketLimiter(rate=1, burst=1, max_clients=2, clock=lambda: 0.0)
+        lru.acquire("a"), lru.acquire("b"), lru.acquire("a"), lru.acquire("c")
+        assert list(lru._buckets) == ["a", "c"]
+        print("✓ Rotating unknown API keys does not bypass the limit")
+
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def slow_query():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "row"
+
+        def reader():
+            results.append(flight.do("book:1", slow_query))
+
+        threads = [threading.Thread(target=reader) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+        assert all(result == "row" for result, _ in results)
+        print("✓ Single-flight coalescing works")
+
+        return True
+    except Exception as e:
+        print(f"✗ Throttling error: {e}")
+        return False
+
+def test_overdue_processing():
+    """Test overdue detection, fines and the scheduler watermark"""
+    try:
+        from datetime import date, timedelta
+        from decimal import Decimal
+        from sqlalchemy.orm import sessionmaker
+        from app import crud, models
+        from app.database import create_db_engine
+        from app.scheduler import process_overdue_loans, calculate_fine
+
+        assert calculate_fine(date(2025, 1, 1), date(2025, 1, 5)) == (4, Decimal("1.00"))
+        assert calculate_fine(date(2025, 1, 1), date(2026, 1, 1))[1] == Decimal("20.00")
+        print("✓ Fine calculation works")
+
+        engine = create_db_engine("sqlite://")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        today = date(2025, 1, 10)
+        db.add(models.Member(first_name="Test", last_name="User", email="test@example.com", join_date=today))
+        db.add_all([models.Book(title=f"Book {i}", isbn=str(i)) for i in range(1, 4)])
+        db.add_all([
+            models.Loan(member_id=1, book_id=1, loan_date=today, due_date=today - timedelta(days=3)),
+            models.Loan(member_id=1, book_id=2, loan_date=today, due_date=today - timedelta(days=3), return_date=today),
+            models.Loan(member_id=1, book_id=3, loan_date=today, due_date=today),
+        ])
+        db.commit()
+
+        assert process_overdue_loans(db, today=today, batch_size=1) == 1
+        assert process_overdue_loans(db, today=today) == 0
+        assert process_overdue_loans(db, today=today + timedelta(days=1)) == 1
+        assert [fine.loan_id for fine in db.query(models.Fine).order_by(models.Fine.loan_id)] == [1, 3]
+        print("✓ Overdue processing only fines newly overdue loans")
+
+        def open_fine(as_of):
+            return next(fine for fine in crud.get_fines(db, today=as_of) if fine.loan_id == 1)
+
+        assert (open_fine(today + timedelta(days=1)).days_overdue, open_fine(today + timedelta(days=1)).amount) == (4, Decimal("1.00"))
+        fine = open_fine(today + timedelta(days=11))
+        assert (fine.days_overdue, fine.amount) == (14, Decimal("3.50"))
+        stored = db.query(models.Fine).filter(models.Fine.loan_id == 1).one()
+        assert (stored.days_overdue, stored.amount) == (3, Decimal("0.75"))
+        print("✓ Open fines keep accruing when read")
+
+        return True
+    except Exception as e:
+        print(f"✗ Overdue processing error: {e}")
+        return False
+
+def test_query_planning():
+    """Test that list queries only accept index-backed filter and sort combinations"""
+    try:
+        from fastapi import HTTPException
+        from functools import partial
+        from app import crud, models
+        from app.planner import plan_list_query
+
+        books = partial(plan_list_query, models.Book.__table__, crud.BOOK_LIST_FIELDS)
+        loans = partial(plan_list_query, models.Loan.__table__, crud.LOAN_LIST_FIELDS)
+        assert books() == "book_id"
+        assert books(sort="title") == "title"
+        assert books(equal=["category_id"]) == "book_id"
+        assert books(equal=["category_id"], ranges=["published_year"]) == "published_year"
+        assert books(equal=["category_id"], sort="book_id") == "book_id"
+        assert loans(equal=["member_id"], sort="loan_date") == "loan_date"
+        assert loans(equal=["member_id"], ranges=["due_date"]) == "due_date"
+        assert loans(ranges=["due_date"], optional_equal=["return_date"]) == "due_date"
+        assert loans(equal=["member_id"], sort="loan_date", optional_equal=["return_date"]) == "loan_date"
+        assert loans(equal=["member_id"], sort="loan_id") == "loan_id"
+        assert loans(equal=["member_id"]) == "loan_id"
+        assert loans(equal=["member_id"], optional_equal=["return_date"]) == "loan_id"
+        print("✓ Index-backed combinations are planned")
+
+        for kwargs in (
+            {"ranges": ["published_year"], "sort": "title"},
+            {"ranges": ["published_year", "title"]},
+        ):
+            try:
+                books(**kwargs)
+            except HTTPException as e:
+                assert e.status_code == 400
+                assert "isbn" not in e.detail
+            else:
+                raise AssertionError(f"{kwargs} should be rejected")
+        print("✓ Unindexed combinations are rejected")
+
+        return True
+    except Exception as e:
+        print(f"✗ Query planning error: {e}")
+        return False
+
+def test_book_counters():
+    """Test that facet counters follow book changes and match a full rebuild"""
+    try:
+        from sqlalchemy.orm import sessionmaker
+        from app import crud, models, schemas
+        from app.database import create_db_engine
+
+        engine = create_db_engine("sqlite://")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(models.Category(category_name="Fiction"))
+        db.commit()
+        crud.init_book_counts(db)
+        crud.create_category(db, schemas.CategoryCreate(category_name="Science"))
+
+        crud.create_book(db, schemas.BookCreate(title="A", isbn="1", category_id=1, copies_available=2))
+        crud.create_book(db, schemas.BookCreate(title="B", isbn="2", category_id=1, copies_available=0))
+        crud.create_book(db, schemas.BookCreate(title="C", isbn="3", copies_available=1))
+        crud.update_book(db, 2, schemas.BookUpdate(category_id=2, copies_available=3))
+        crud.delete_book(db, 3)
+
+        facets = crud.get_book_facets(db)
+        assert (facets["total"], facets["available"]) == (2, 2)
+        assert [(c["category_name"], c["total"], c["available"]) for c in facets["categories"]] == [
+            ("Fiction", 1, 1), ("Science", 1, 1)
+        ]
+        assert crud.count_books(db, category_id=1) == (1, True)
+        crud.rebuild_book_counts(db)
+        assert crud.get_book_facets(db) == facets
+        print("✓ Book counters stay consistent")
+
+        return True
+    except Exception as e:
+        print(f"✗ Book counter error: {e}")
+        return False
+
+def test_sqlite_backend():
+    """Test the tuned SQLite backend used for tests and single-site installs"""
+    try:
+        import os
+        import tempfile
+        from datetime import date
+        from sqlalchemy import text
+        from sqlalchemy.orm import sessionmaker
+        from app import models
+        from app.database import create_db_engine
+
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'library.db')}")
+            models.Base.metadata.create_all(bind=engine)
+            with engine.connect() as conn:
+                assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+                assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+            print("✓ SQLite PRAGMAs applied")
+
+            db = sessionmaker(bind=engine)()
+            member = models.Member(first_name="Test", last_name="User", email="test@example.com")
+            db.add(member)
+            db.commit()
+            assert member.join_date == date.today()
+            db.close()
+            engine.dispose()
+            print("✓ current_date defaults work on SQLite")
+
+        return True
+    except Exception as e:
+        print(f"✗ SQLite backend error: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("Library Management System API - Basic Tests")
@@ -87,7 +312,12 @@ def main():
     tests = [
         ("Import Test", test_imports),
         ("App Creation Test", test_app_creation),
-        ("Schema Validation Test", test_schemas)
+        ("Schema Validation Test", test_schemas),
+        ("Request Throttling Test", test_request_throttling),
+        ("Overdue Processing Test", test_overdue_processing),
+        ("Query Planning Test", test_query_planning),
+        ("Book Counter Test", test_book_counters),
+        ("SQLite Backend Test", test_sqlite_backend)
     ]
     
     passed = 0